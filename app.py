@@ -1,41 +1,89 @@
 from flask import Flask, render_template, request, jsonify
+import atexit
 import json
 import os
 import sys
 from datetime import datetime
+from libraries import DEFAULT_LIBRARY, LibraryRegistry, is_valid_library_id
+from recommendations import Recommender
+from search import search_library
 
 app = Flask(__name__)
 
-# Arquivo para armazenar os filmes
+# Arquivo para armazenar os filmes da biblioteca padrão
 MOVIES_FILE = 'movies.json'
 
-def load_movies():
-    """Carrega os filmes do arquivo JSON"""
-    if os.path.exists(MOVIES_FILE):
-        try:
-            with open(MOVIES_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"❌ Erro ao carregar filmes: {e}")
-            return []
-    return []
+# Pasta com os arquivos das demais bibliotecas
+LIBRARIES_DIR = os.environ.get('TRACKFLIX_LIBRARIES_DIR', os.path.join('data', 'libraries'))
 
-def save_movies(movies):
-    """Salva os filmes no arquivo JSON"""
-    try:
-        with open(MOVIES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(movies, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        print(f"❌ Erro ao salvar filmes: {e}")
-        return False
+# Memória máxima (em MB) para bibliotecas carregadas
+LIBRARY_MEMORY_MB = int(os.environ.get('TRACKFLIX_LIBRARY_MEMORY_MB', '64'))
+
+# Dias que as exclusões ficam disponíveis para sincronização
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get('TRACKFLIX_TOMBSTONE_RETENTION_DAYS', '30'))
+
+libraries = LibraryRegistry(
+    LIBRARIES_DIR,
+    LIBRARY_MEMORY_MB * 1024 * 1024,
+    default_file=MOVIES_FILE,
+    retention_days=TOMBSTONE_RETENTION_DAYS
+)
+
+# Garante que nada pendente se perca ao encerrar o servidor
+atexit.register(libraries.flush_all)
+
+def load_movies(library_id=DEFAULT_LIBRARY):
+    """Carrega os filmes de uma biblioteca"""
+    return libraries.get(library_id).movies
 
-@app.route('/')
-def index():
+def save_movies(library):
+    """Salva os filmes de uma biblioteca no arquivo JSON (chamar dentro de `libraries.locked`)"""
+    return libraries.save(library)
+
+def get_recommender(library):
+    """Retorna as recomendações da biblioteca, calculando na primeira consulta (chamar dentro de `libraries.locked`)"""
+    if library.recommender is None:
+        library.recommender = Recommender(library.movies)
+        libraries.update_usage(library)
+    return library.recommender
+
+def refresh_recommender(library, added=None, removed_id=None, updated=None):
+    """
+    Mantém as recomendações em dia depois de uma alteração (chamar dentro de
+    `libraries.locked`). Só as listas de vizinhos afetadas são recalculadas,
+    para que as consultas continuem só lendo o cache.
+    """
+    if library.recommender is None:
+        return
+    if added is not None:
+        library.recommender.add(added)
+    if removed_id is not None:
+        library.recommender.remove(removed_id)
+    if updated is not None:
+        library.recommender.update(updated)
+    libraries.update_usage(library)
+
+@app.before_request
+def validate_library_id():
+    """Rejeita identificadores de biblioteca inválidos"""
+    library_id = (request.view_args or {}).get('library_id')
+    if library_id is not None and not is_valid_library_id(library_id):
+        return jsonify({
+            'success': False,
+            'error': 'Biblioteca inválida'
+        }), 400
+
+@app.route('/', defaults={'library_id': DEFAULT_LIBRARY})
+@app.route('/libraries/<library_id>')
+def index(library_id):
     """Página principal"""
-    movies = load_movies()
-    print(f"🎬 Carregando {len(movies)} filmes para a página inicial")
-    return render_template('index.html', movies=movies)
+    movies = load_movies(library_id)
+    print(f"🎬 Carregando {len(movies)} filmes da biblioteca '{library_id}' para a página inicial")
+    if library_id == DEFAULT_LIBRARY:
+        api_base = '/api'
+    else:
+        api_base = f'/api/libraries/{library_id}'
+    return render_template('index.html', movies=movies, library_id=library_id, api_base=api_base)
 
 # ============================================
 # API ENDPOINTS
@@ -52,14 +100,24 @@ def test_api():
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     })
 
-@app.route('/api/movies', methods=['GET'])
-def get_all_movies():
+@app.route('/api/movies', methods=['GET'], defaults={'library_id': DEFAULT_LIBRARY})
+@app.route('/api/libraries/<library_id>/movies', methods=['GET'])
+def get_all_movies(library_id):
     """Retorna todos os filmes"""
-    movies = load_movies()
+    movies = load_movies(library_id)
     return jsonify(movies)
 
-@app.route('/api/movies', methods=['POST'])
-def add_movie():
+@app.route('/api/movies/changes', methods=['GET'], defaults={'library_id': DEFAULT_LIBRARY})
+@app.route('/api/libraries/<library_id>/movies/changes', methods=['GET'])
+def get_movie_changes(library_id):
+    """Retorna apenas o que mudou desde a versão informada em `since`"""
+    since = request.args.get('since', 0, type=int)
+    library = libraries.get(library_id)
+    return jsonify(library.changes_since(since))
+
+@app.route('/api/movies', methods=['POST'], defaults={'library_id': DEFAULT_LIBRARY})
+@app.route('/api/libraries/<library_id>/movies', methods=['POST'])
+def add_movie(library_id):
     """Adiciona um novo filme"""
     try:
         data = request.json
@@ -71,38 +129,41 @@ def add_movie():
                 'error': 'Título é obrigatório'
             }), 400
         
-        movies = load_movies()
-        
-        # Cria um novo ID
-        new_id = max([m.get('id', 0) for m in movies], default=0) + 1
-        
-        new_movie = {
-            'id': new_id,
-            'title': data.get('title', '').strip(),
-            'year': data.get('year', '').strip(),
-            'type': data.get('type', 'movie'),
-            'poster': data.get('poster', '').strip(),
-            'genre': data.get('genre', '').strip(),
-            'status': data.get('status', 'pending'),
-            'rating': data.get('rating', 0),
-            'notes': data.get('notes', '').strip(),
-            'date_added': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        movies.append(new_movie)
-        
-        if save_movies(movies):
-            print(f"✅ Filme adicionado com sucesso: {new_movie['title']} (ID: {new_movie['id']})")
-            return jsonify({
-                'success': True, 
-                'movie': new_movie
-            })
-        else:
-            return jsonify({
-                'success': False, 
-                'error': 'Erro ao salvar no arquivo'
-            }), 500
-        
+        with libraries.locked(library_id) as library:
+            movies = library.movies
+            
+            # Cria um novo ID
+            new_id = max([m.get('id', 0) for m in movies], default=0) + 1
+            
+            new_movie = {
+                'id': new_id,
+                'title': data.get('title', '').strip(),
+                'year': data.get('year', '').strip(),
+                'type': data.get('type', 'movie'),
+                'poster': data.get('poster', '').strip(),
+                'genre': data.get('genre', '').strip(),
+                'status': data.get('status', 'pending'),
+                'rating': data.get('rating', 0),
+                'notes': data.get('notes', '').strip(),
+                'date_added': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+            
+            movies.append(new_movie)
+            library.touch(new_movie)
+            refresh_recommender(library, added=new_movie)
+            
+            if save_movies(library):
+                print(f"✅ Filme adicionado com sucesso: {new_movie['title']} (ID: {new_movie['id']})")
+                return jsonify({
+                    'success': True, 
+                    'movie': new_movie
+                })
+            else:
+                return jsonify({
+                    'success': False, 
+                    'error': 'Erro ao salvar no arquivo'
+                }), 500
+            
     except Exception as e:
         print(f"❌ Erro ao adicionar filme: {e}")
         return jsonify({
@@ -110,122 +171,173 @@ def add_movie():
             'error': str(e)
         }), 500
 
-@app.route('/api/movies/<int:movie_id>/rating', methods=['PUT'])
-def update_rating(movie_id):
+@app.route('/api/movies/<int:movie_id>/rating', methods=['PUT'], defaults={'library_id': DEFAULT_LIBRARY})
+@app.route('/api/libraries/<library_id>/movies/<int:movie_id>/rating', methods=['PUT'])
+def update_rating(library_id, movie_id):
     """Atualiza a avaliação de um filme"""
     try:
         data = request.json
         rating = data.get('rating', 0)
         
-        movies = load_movies()
-        
-        for movie in movies:
-            if movie.get('id') == movie_id:
-                movie['rating'] = rating
-                movie['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                
-                if save_movies(movies):
-                    return jsonify({
-                        'success': True, 
-                        'rating': rating
-                    })
-                else:
-                    return jsonify({
-                        'success': False, 
-                        'error': 'Erro ao salvar'
-                    }), 500
-        
-        return jsonify({
-            'success': False, 
-            'error': 'Filme não encontrado'
-        }), 404
-        
+        with libraries.locked(library_id) as library:
+            movies = library.movies
+            
+            for movie in movies:
+                if movie.get('id') == movie_id:
+                    movie['rating'] = rating
+                    movie['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    library.touch(movie)
+                    refresh_recommender(library, updated=movie)
+                    
+                    if save_movies(library):
+                        return jsonify({
+                            'success': True, 
+                            'rating': rating
+                        })
+                    else:
+                        return jsonify({
+                            'success': False, 
+                            'error': 'Erro ao salvar'
+                        }), 500
+            
+            return jsonify({
+                'success': False, 
+                'error': 'Filme não encontrado'
+            }), 404
+            
     except Exception as e:
         return jsonify({
             'success': False, 
             'error': str(e)
         }), 500
 
-@app.route('/api/movies/<int:movie_id>/status', methods=['PUT'])
-def update_status(movie_id):
+@app.route('/api/movies/<int:movie_id>/status', methods=['PUT'], defaults={'library_id': DEFAULT_LIBRARY})
+@app.route('/api/libraries/<library_id>/movies/<int:movie_id>/status', methods=['PUT'])
+def update_status(library_id, movie_id):
     """Atualiza o status de um filme"""
     try:
         data = request.json
         status = data.get('status', 'pending')
         
-        movies = load_movies()
-        
-        for movie in movies:
-            if movie.get('id') == movie_id:
-                movie['status'] = status
-                
-                if save_movies(movies):
-                    return jsonify({
-                        'success': True, 
-                        'status': status
-                    })
+        with libraries.locked(library_id) as library:
+            movies = library.movies
+            
+            for movie in movies:
+                if movie.get('id') == movie_id:
+                    movie['status'] = status
+                    library.touch(movie)
+                    refresh_recommender(library, updated=movie)
+                    
+                    if save_movies(library):
+                        return jsonify({
+                            'success': True, 
+                            'status': status
+                        })
+                    else:
+                        return jsonify({
+                            'success': False, 
+                            'error': 'Erro ao salvar'
+                        }), 500
+            
+            return jsonify({
+                'success': False, 
+                'error': 'Filme não encontrado'
+            }), 404
+            
+    except Exception as e:
+        return jsonify({
+            'success': False, 
+            'error': str(e)
+        }), 500
+
+@app.route('/api/movies/<int:movie_id>', methods=['DELETE'], defaults={'library_id': DEFAULT_LIBRARY})
+@app.route('/api/libraries/<library_id>/movies/<int:movie_id>', methods=['DELETE'])
+def delete_movie(library_id, movie_id):
+    """Remove um filme"""
+    try:
+        with libraries.locked(library_id) as library:
+            movies = library.movies
+            initial_count = len(movies)
+            
+            movies = [m for m in movies if m.get('id') != movie_id]
+            
+            if len(movies) < initial_count:
+                library.movies = movies
+                library.record_deletion(movie_id)
+                refresh_recommender(library, removed_id=movie_id)
+                if save_movies(library):
+                    return jsonify({'success': True})
                 else:
                     return jsonify({
                         'success': False, 
                         'error': 'Erro ao salvar'
                     }), 500
-        
-        return jsonify({
-            'success': False, 
-            'error': 'Filme não encontrado'
-        }), 404
-        
+            else:
+                return jsonify({
+                    'success': False, 
+                    'error': 'Filme não encontrado'
+                }), 404
+                
     except Exception as e:
         return jsonify({
             'success': False, 
             'error': str(e)
         }), 500
 
-@app.route('/api/movies/<int:movie_id>', methods=['DELETE'])
-def delete_movie(movie_id):
-    """Remove um filme"""
+@app.route('/api/movies/<int:movie_id>/similar', methods=['GET'], defaults={'library_id': DEFAULT_LIBRARY})
+@app.route('/api/libraries/<library_id>/movies/<int:movie_id>/similar', methods=['GET'])
+def similar_movies(library_id, movie_id):
+    """Retorna os títulos mais parecidos com um filme"""
     try:
-        movies = load_movies()
-        initial_count = len(movies)
-        
-        movies = [m for m in movies if m.get('id') != movie_id]
+        with libraries.locked(library_id) as library:
+            similar = get_recommender(library).similar(movie_id)
         
-        if len(movies) < initial_count:
-            if save_movies(movies):
-                return jsonify({'success': True})
-            else:
-                return jsonify({
-                    'success': False, 
-                    'error': 'Erro ao salvar'
-                }), 500
-        else:
+        if similar is None:
             return jsonify({
                 'success': False, 
                 'error': 'Filme não encontrado'
             }), 404
-            
+        
+        return jsonify({
+            'success': True,
+            'movies': [dict(movie, score=round(score, 4)) for movie, score in similar]
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False, 
+            'error': str(e)
+        }), 500
+
+@app.route('/api/movies/next', methods=['GET'], defaults={'library_id': DEFAULT_LIBRARY})
+@app.route('/api/libraries/<library_id>/movies/next', methods=['GET'])
+def watch_next(library_id):
+    """Sugere o que assistir a seguir com base no que já foi assistido"""
+    try:
+        limit = max(request.args.get('limit', 10, type=int), 0)
+        with libraries.locked(library_id) as library:
+            suggestions = get_recommender(library).watch_next(limit)
+        
+        return jsonify({
+            'success': True,
+            'movies': [dict(movie, score=round(score, 4)) for movie, score in suggestions]
+        })
+        
     except Exception as e:
         return jsonify({
             'success': False, 
             'error': str(e)
         }), 500
 
-@app.route('/api/search', methods=['GET'])
-def search_movies():
+@app.route('/api/search', methods=['GET'], defaults={'library_id': DEFAULT_LIBRARY})
+@app.route('/api/libraries/<library_id>/search', methods=['GET'])
+def search_movies(library_id):
     """Busca filmes por título ou gênero"""
     try:
         query = request.args.get('q', '').lower()
-        movies = load_movies()
-        
-        if query:
-            filtered = [
-                m for m in movies 
-                if query in m.get('title', '').lower() or 
-                   query in m.get('genre', '').lower() or
-                   query in m.get('year', '')
-            ]
-        else:
-            filtered = movies
+        library = libraries.get(library_id)
+        filtered = search_library(library, query)
+        libraries.update_usage(library)
         
         return jsonify(filtered)
         
@@ -261,6 +373,7 @@ def debug():
                 'js_exists': os.path.exists('static/js')
             }
         },
+        'libraries': libraries.stats(),
         'movies_data': {
             'count': len(load_movies()),
             'sample': load_movies()[:3]  # Primeiros 3 filmes para exemplo
@@ -472,6 +585,9 @@ def debug():
                 <h3>📁 Estrutura de Arquivos:</h3>
                 <pre>{json.dumps(system_info['files'], indent=2)}</pre>
                 
+                <h3>📚 Bibliotecas em Memória:</h3>
+                <pre>{json.dumps(system_info['libraries'], indent=2)}</pre>
+                
                 <h3>🎬 Dados dos Filmes:</h3>
                 <p>Total de filmes cadastrados: <strong>{system_info['movies_data']['count']}</strong></p>
                 <pre>{json.dumps(system_info['movies_data']['sample'], indent=2)}</pre>
@@ -706,6 +822,9 @@ if __name__ == '__main__':
         movies = load_movies()
         print(f"   • Filmes cadastrados: {len(movies)}")
     
+    print(f"📚 Pasta das bibliotecas: {os.path.abspath(LIBRARIES_DIR)}")
+    print(f"   • Memória máxima: {LIBRARY_MEMORY_MB} MB")
+    
     print(f"📁 Pasta templates: {os.path.exists('templates')}")
     if os.path.exists('templates'):
         print(f"   • Arquivos: {os.listdir('templates')}")
@@ -715,10 +834,14 @@ if __name__ == '__main__':
     print("=" * 60)
     print("🌐 URLs disponíveis:")
     print("   • http://localhost:5000/ - Página principal")
+    print("   • http://localhost:5000/libraries/<id> - Página de uma biblioteca")
     print("   • http://localhost:5000/debug - Página de diagnóstico")
     print("   • http://localhost:5000/quick-test - Teste rápido")
     print("   • http://localhost:5000/api/test - Teste da API")
     print("   • http://localhost:5000/api/movies - Listar filmes (GET)")
+    print("   • http://localhost:5000/api/movies/next - O que assistir a seguir (GET)")
+    print("   • http://localhost:5000/api/movies/changes?since=<versão> - Alterações desde uma versão (GET)")
+    print("   • http://localhost:5000/api/libraries/<id>/movies - Filmes de uma biblioteca (GET)")
     print("=" * 60)
     print("🔄 Pressione CTRL+C para parar o servidor")
     print("=" * 60)
@@ -0,0 +1,102 @@
+"""
+Teste de carga da busca enquanto o usuário digita.
+
+Cria uma biblioteca temporária com títulos aleatórios e simula vários
+clientes digitando a mesma busca, uma tecla por requisição, usando o
+cliente de teste do Flask. Mede o tempo de CPU por tecla com a busca
+atual (single-flight + refinamento) e com a varredura completa a cada
+requisição.
+
+Uso: python bench_search.py [--titles 20000] [--clients 8] [--query interestelar]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+GENRES = ['Ação', 'Drama', 'Comédia', 'Terror', 'Ficção Científica', 'Fantasia']
+WORDS = ['noite', 'inter', 'estelar', 'vampiro', 'sol', 'mar', 'tempo', 'lugar', 'casa', 'rio']
+
+
+def make_movies(count):
+    random.seed(0)
+    return [
+        {
+            'id': i,
+            'title': ' '.join(random.sample(WORDS, 3)) + f' {i}',
+            'genre': random.choice(GENRES),
+            'year': str(random.randint(1950, 2024)),
+            'type': 'movie',
+            'status': 'pending',
+            'rating': 0,
+            'version': 1
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def full_scan(library, query):
+    """Busca sem cache: varre a biblioteca inteira a cada requisição"""
+    from search import matches
+    if not query:
+        return library.movies
+    return [m for m in library.movies if matches(m, query)]
+
+
+def run(app_module, library_id, clients, query):
+    client = app_module.app.test_client()
+
+    def type_query():
+        for n in range(1, len(query) + 1):
+            client.get(f'/api/libraries/{library_id}/search?q={query[:n]}')
+
+    threads = [threading.Thread(target=type_query) for _ in range(clients)]
+    start = time.process_time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cpu = time.process_time() - start
+    return cpu * 1000 / (clients * len(query))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga da busca')
+    parser.add_argument('--titles', type=int, default=20000)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--query', default='interestelar')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ['TRACKFLIX_LIBRARIES_DIR'] = folder
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app as app_module
+
+        registry = app_module.libraries
+        data = {'version': 1, 'movies': make_movies(args.titles)}
+        for library_id in ('scan', 'cached'):
+            path = registry.path_for(library_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            registry.get(library_id)
+
+        print(f"🔍 {args.titles} títulos, {args.clients} clientes digitando \"{args.query}\"")
+
+        original = app_module.search_library
+        app_module.search_library = full_scan
+        scan_ms = run(app_module, 'scan', args.clients, args.query)
+        app_module.search_library = original
+        cached_ms = run(app_module, 'cached', args.clients, args.query)
+
+        print(f"   • Varredura completa:       {scan_ms:.1f} ms de CPU por tecla")
+        print(f"   • Single-flight + refino:   {cached_ms:.1f} ms de CPU por tecla")
+
+
+if __name__ == '__main__':
+    main()
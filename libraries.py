@@ -0,0 +1,328 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# Biblioteca usada pelas rotas antigas (/api/movies, /api/search, ...)
+DEFAULT_LIBRARY = 'default'
+
+# Identificadores aceitos nas rotas: letras, números, "_" e "-"
+LIBRARY_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Formato das datas gravadas nos registros
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Custo mínimo (em bytes) de uma biblioteca em memória, mesmo sem arquivo
+MIN_LIBRARY_SIZE = 4096
+
+
+def estimate_size(value):
+    """
+    Estimativa (em bytes) da memória ocupada por um valor lido do JSON.
+
+    Soma o tamanho de cada objeto Python; as chaves dos dicionários não
+    entram porque o leitor de JSON reaproveita a mesma string em todos os
+    registros.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(v) for v in value.values())
+    elif isinstance(value, list):
+        size += sum(estimate_size(v) for v in value)
+    return size
+
+
+def is_valid_library_id(library_id):
+    """Verifica se o identificador da biblioteca é seguro para virar nome de arquivo"""
+    return bool(library_id) and LIBRARY_ID_PATTERN.match(library_id) is not None
+
+
+class Library:
+    """
+    Uma biblioteca de filmes mantida em memória.
+
+    Cada alteração incrementa `version` e grava a nova versão no registro
+    alterado; exclusões viram tombstones, mantidas por `retention_days`, para
+    que os clientes possam pedir só o que mudou desde a última sincronização.
+    """
+
+    def __init__(self, library_id, path, data, retention_days):
+        self.id = library_id
+        self.path = path
+        self.retention_days = retention_days
+        self.dirty = False
+        # Trava usada em toda leitura-alteração-gravação da biblioteca
+        self.lock = threading.RLock()
+        # Quantas requisições estão usando a biblioteca em `locked()`
+        self.pins = 0
+        # Memória contabilizada no registro para esta biblioteca
+        self.charged = 0
+
+        if isinstance(data, list):
+            # Arquivo no formato antigo (apenas a lista de filmes)
+            data = {'version': 1, 'movies': data}
+            for movie in data['movies']:
+                movie.setdefault('version', 1)
+
+        self.version = data.get('version', 0)
+        self.movies = data.get('movies', [])
+        self.tombstones = data.get('tombstones', [])
+        # Versão mais alta entre os tombstones já descartados
+        self.pruned_version = data.get('pruned_version', 0)
+        self.prune_tombstones()
+        # Memória ocupada pelos filmes e tombstones carregados
+        self.size = estimate_size(self.movies) + estimate_size(self.tombstones)
+        # Recomendações calculadas sob demanda (ver recommendations.py)
+        self.recommender = None
+        # Buscas recentes (ver search.py)
+        self.search_cache = None
+
+    def touch(self, movie):
+        """
+        Marca um registro como criado ou alterado.
+
+        Deve ser chamado depois que a alteração já está visível em `movies`:
+        a versão da biblioteca só avança no fim, para que quem lê a versão
+        nova (buscas, sincronização) também veja a alteração.
+        """
+        version = self.version + 1
+        movie['version'] = version
+        self.version = version
+
+    def record_deletion(self, movie_id):
+        """Registra a exclusão de um filme (já retirado de `movies`) como tombstone"""
+        version = self.version + 1
+        self.tombstones.append({
+            'id': movie_id,
+            'version': version,
+            'deleted_at': datetime.now().strftime(DATE_FORMAT)
+        })
+        self.prune_tombstones()
+        self.version = version
+
+    def prune_tombstones(self):
+        """Descarta tombstones mais antigos que a janela de retenção"""
+        limit = datetime.now() - timedelta(days=self.retention_days)
+        kept = []
+        for tombstone in self.tombstones:
+            try:
+                deleted_at = datetime.strptime(tombstone.get('deleted_at', ''), DATE_FORMAT)
+            except ValueError:
+                deleted_at = limit
+            if deleted_at > limit:
+                kept.append(tombstone)
+            else:
+                self.pruned_version = max(self.pruned_version, tombstone.get('version', 0))
+        self.tombstones = kept
+
+    def changes_since(self, since):
+        """
+        Retorna os registros alterados e os ids excluídos depois de `since`.
+
+        Se a versão pedida for anterior aos tombstones ainda guardados, não dá
+        para saber o que foi excluído; nesse caso a lista completa é enviada
+        com `full` = True e o cliente deve substituir sua cópia local.
+
+        A versão é lida antes de tudo: como ela só avança depois que a
+        alteração está visível, tudo até essa versão entra na resposta, mesmo
+        que outra requisição altere a biblioteca durante a leitura.
+        """
+        version = self.version
+        movies = self.movies
+        tombstones = self.tombstones
+
+        if since <= 0 or since < self.pruned_version or since > version:
+            return {
+                'version': version,
+                'full': True,
+                'movies': movies,
+                'deleted': []
+            }
+
+        changed = [m for m in movies if m.get('version', 0) > since]
+        # Um id excluído e depois reaproveitado volta como registro, não como exclusão
+        current_ids = {m.get('id') for m in movies}
+        deleted = [
+            t['id'] for t in tombstones
+            if t.get('version', 0) > since and t['id'] not in current_ids
+        ]
+        return {
+            'version': version,
+            'full': False,
+            'movies': changed,
+            'deleted': deleted
+        }
+
+    def memory_size(self):
+        """Estimativa da memória ocupada pela biblioteca e seus caches"""
+        size = max(self.size, MIN_LIBRARY_SIZE)
+        if self.recommender is not None:
+            size += self.recommender.nbytes()
+        if self.search_cache is not None:
+            size += self.search_cache.nbytes()
+        return size
+
+    def to_dict(self):
+        """Conteúdo gravado no arquivo da biblioteca"""
+        return {
+            'version': self.version,
+            'pruned_version': self.pruned_version,
+            'movies': self.movies,
+            'tombstones': self.tombstones
+        }
+
+    def flush(self):
+        """Grava a biblioteca no disco; retorna True em caso de sucesso"""
+        try:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            data = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            self.size = estimate_size(self.movies) + estimate_size(self.tombstones)
+            self.dirty = False
+            return True
+        except Exception as e:
+            print(f"❌ Erro ao salvar biblioteca '{self.id}': {e}")
+            return False
+
+
+class LibraryRegistry:
+    """
+    Registro em memória das bibliotecas.
+
+    Cada biblioteca fica no seu próprio arquivo, em subpastas (shards) para
+    não acumular milhares de arquivos no mesmo diretório. As bibliotecas são
+    carregadas no primeiro acesso e as menos usadas recentemente são
+    removidas da memória (gravando antes o que estiver pendente) quando o
+    total passa de `memory_budget` bytes.
+
+    O orçamento conta a memória estimada dos objetos carregados (filmes e
+    tombstones, ver `estimate_size`), não o tamanho dos arquivos, mais as
+    matrizes de recomendação e os resultados de busca guardados. Cada
+    biblioteca custa no mínimo `MIN_LIBRARY_SIZE` bytes.
+
+    Alterações devem ser feitas dentro de `locked()`: enquanto alguém estiver
+    usando a biblioteca ali, ela não é removida da memória.
+    """
+
+    def __init__(self, base_dir, memory_budget, default_file=None, retention_days=30):
+        self.base_dir = base_dir
+        self.memory_budget = memory_budget
+        self.default_file = default_file
+        self.retention_days = retention_days
+        self._libraries = OrderedDict()
+        self._used_bytes = 0
+        self._lock = threading.RLock()
+
+    def path_for(self, library_id):
+        """Caminho do arquivo JSON de uma biblioteca"""
+        if library_id == DEFAULT_LIBRARY and self.default_file:
+            return self.default_file
+        shard = hashlib.sha1(library_id.encode('utf-8')).hexdigest()[:2]
+        return os.path.join(self.base_dir, shard, f'{library_id}.json')
+
+    def get(self, library_id):
+        """Retorna a biblioteca, carregando do disco se ainda não estiver em memória"""
+        with self._lock:
+            library = self._libraries.get(library_id)
+            if library is not None:
+                self._libraries.move_to_end(library_id)
+            else:
+                library = self._load(library_id)
+                self._libraries[library_id] = library
+            self._account(library)
+            return library
+
+    @contextmanager
+    def locked(self, library_id):
+        """Entrega a biblioteca travada; ela fica fixa na memória até o fim do bloco"""
+        with self._lock:
+            library = self.get(library_id)
+            library.pins += 1
+        try:
+            with library.lock:
+                yield library
+        finally:
+            with self._lock:
+                library.pins -= 1
+
+    def save(self, library):
+        """Grava a biblioteca e atualiza o uso de memória"""
+        with self._lock:
+            if self._libraries.get(library.id) is not library:
+                # Cópia antiga, já removida da memória: gravar apagaria dados novos
+                print(f"❌ Biblioteca '{library.id}' não está mais carregada; gravação recusada")
+                return False
+            library.dirty = True
+            saved = library.flush()
+            self._account(library)
+            return saved
+
+    def update_usage(self, library):
+        """Recalcula a memória de uma biblioteca depois que seus caches mudam"""
+        with self._lock:
+            if self._libraries.get(library.id) is library:
+                self._account(library)
+
+    def flush_all(self):
+        """Grava todas as bibliotecas com alterações pendentes"""
+        with self._lock:
+            for library in self._libraries.values():
+                if library.dirty:
+                    library.flush()
+
+    def stats(self):
+        """Informações do registro para a página de diagnóstico"""
+        with self._lock:
+            return {
+                'loaded': len(self._libraries),
+                'used_bytes': self._used_bytes,
+                'memory_budget': self.memory_budget
+            }
+
+    def _load(self, library_id):
+        path = self.path_for(library_id)
+        data = []
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"❌ Erro ao carregar biblioteca '{library_id}': {e}")
+                data = []
+        return Library(library_id, path, data, self.retention_days)
+
+    def _account(self, library):
+        size = library.memory_size()
+        self._used_bytes += size - library.charged
+        library.charged = size
+        if self._used_bytes > self.memory_budget:
+            self._evict(keep=library.id)
+
+    def _evict(self, keep):
+        # Remove as bibliotecas menos usadas até caber no orçamento de memória
+        victims = []
+        freed = 0
+        for library_id, library in self._libraries.items():
+            if self._used_bytes - freed <= self.memory_budget:
+                break
+            if library_id == keep or library.pins:
+                # Em uso por alguma requisição
+                continue
+            if library.dirty and not library.flush():
+                # Não descarta dados que ainda não foram gravados
+                continue
+            victims.append(library)
+            freed += library.charged
+
+        for library in victims:
+            del self._libraries[library.id]
+            self._used_bytes -= library.charged
+            print(f"♻️ Biblioteca '{library.id}' removida da memória")
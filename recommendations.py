@@ -0,0 +1,267 @@
+import re
+
+import numpy as np
+
+# Quantos vizinhos guardar para cada título
+DEFAULT_K = 10
+
+# Linhas processadas por vez no cálculo das similaridades
+BATCH_SIZE = 512
+
+# Peso de cada grupo de atributos no vetor do título
+GENRE_WEIGHT = 1.0
+TYPE_WEIGHT = 0.5
+DECADE_WEIGHT = 0.5
+RATING_WEIGHT = 0.5
+STATUS_WEIGHT = 0.25
+
+TYPES = ['movie', 'series']
+DECADES = list(range(1900, 2040, 10))
+STATUSES = ['pending', 'watching', 'watched']
+
+# Colunas que não dependem dos gêneros da biblioteca
+FIXED_DIMENSION = len(TYPES) + len(DECADES) + 5 + len(STATUSES)
+
+
+def split_genres(genre):
+    """Separa um campo de gênero como "Ação, Drama" em termos normalizados"""
+    return [g.strip().lower() for g in re.split(r'[,/;|]', genre or '') if g.strip()]
+
+
+class Recommender:
+    """
+    Recomendações "parecidos com este" e "o que assistir a seguir".
+
+    Cada título vira um vetor normalizado (gêneros, tipo, década, nota e
+    status) e os k vizinhos mais próximos de todos os títulos são calculados
+    de uma vez, em blocos, com multiplicação de matrizes. As consultas só
+    leem o resultado guardado; `add`, `remove` e `update` recalculam apenas
+    as linhas afetadas quando um título entra, sai ou muda de nota/status.
+
+    As colunas de gênero ficam no fim do vetor: um gênero novo só acrescenta
+    uma coluna zerada aos títulos existentes, sem alterar suas similaridades.
+    """
+
+    def __init__(self, movies, k=DEFAULT_K):
+        self.k = k
+        self.movies = {m.get('id'): m for m in movies}
+        self.ids = list(self.movies)
+        self.rows = {movie_id: row for row, movie_id in enumerate(self.ids)}
+
+        genres = sorted({g for m in movies for g in split_genres(m.get('genre'))})
+        self.genre_columns = {g: FIXED_DIMENSION + i for i, g in enumerate(genres)}
+        self.dimension = FIXED_DIMENSION + len(genres)
+
+        self.vectors = np.zeros((len(self.ids), self.dimension))
+        for row, movie_id in enumerate(self.ids):
+            self.vectors[row] = self.encode(self.movies[movie_id])
+
+        self.width = min(self.k, max(len(self.ids) - 1, 0))
+        self.top_rows = np.zeros((len(self.ids), self.width), dtype=np.int64)
+        self.top_scores = np.zeros((len(self.ids), self.width))
+        self._compute_rows(np.arange(len(self.ids)))
+        self._watch_next = None
+
+    def encode(self, movie):
+        """Converte um título no seu vetor de atributos (norma 1)"""
+        vector = np.zeros(self.dimension)
+        offset = 0
+
+        if movie.get('type') in TYPES:
+            vector[offset + TYPES.index(movie.get('type'))] = TYPE_WEIGHT
+        offset += len(TYPES)
+
+        try:
+            decade = int(str(movie.get('year', '')).strip()[:4]) // 10 * 10
+        except ValueError:
+            decade = None
+        if decade in DECADES:
+            vector[offset + DECADES.index(decade)] = DECADE_WEIGHT
+        offset += len(DECADES)
+
+        rating = self._rating(movie)
+        if 1 <= rating <= 5:
+            vector[offset + rating - 1] = RATING_WEIGHT
+        offset += 5
+
+        if movie.get('status') in STATUSES:
+            vector[offset + STATUSES.index(movie.get('status'))] = STATUS_WEIGHT
+
+        genres = [g for g in split_genres(movie.get('genre')) if g in self.genre_columns]
+        for genre in genres:
+            vector[self.genre_columns[genre]] = GENRE_WEIGHT / len(genres)
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def similar(self, movie_id):
+        """Títulos mais parecidos com `movie_id`, ou None se ele não existir"""
+        row = self.rows.get(movie_id)
+        if row is None:
+            return None
+        return [
+            (self.movies[self.ids[r]], float(score))
+            for r, score in zip(self.top_rows[row], self.top_scores[row])
+        ]
+
+    def watch_next(self, limit=DEFAULT_K):
+        """Títulos pendentes mais próximos do que já foi assistido e bem avaliado"""
+        if self._watch_next is None:
+            self._watch_next = self._compute_watch_next()
+        return self._watch_next[:max(limit, 0)]
+
+    def nbytes(self):
+        """Estimativa da memória usada pelas matrizes e índices"""
+        arrays = self.vectors.nbytes + self.top_rows.nbytes + self.top_scores.nbytes
+        # Dicionários de ids e linhas: ~100 bytes por título em cada um
+        return arrays + 200 * len(self.ids)
+
+    def add(self, movie):
+        """Inclui um título novo, ajustando só as listas em que ele entra"""
+        movie_id = movie.get('id')
+        if movie_id in self.rows:
+            self.update(movie)
+            return
+
+        new_genres = [g for g in split_genres(movie.get('genre')) if g not in self.genre_columns]
+        for genre in dict.fromkeys(new_genres):
+            self.genre_columns[genre] = self.dimension
+            self.dimension += 1
+        if new_genres:
+            padding = np.zeros((len(self.ids), self.dimension - self.vectors.shape[1]))
+            self.vectors = np.hstack([self.vectors, padding])
+
+        row = len(self.ids)
+        self.movies[movie_id] = movie
+        self.ids.append(movie_id)
+        self.rows[movie_id] = row
+        self.vectors = np.vstack([self.vectors, self.encode(movie)])
+        self._watch_next = None
+
+        width = min(self.k, row)
+        if width != self.width:
+            # Biblioteca com menos de k + 1 títulos: recalcula tudo (é pequena)
+            self._resize(width)
+            self._compute_rows(np.arange(len(self.ids)))
+            return
+
+        self.top_rows = np.vstack([self.top_rows, np.zeros((1, width), dtype=np.int64)])
+        self.top_scores = np.vstack([self.top_scores, np.zeros((1, width))])
+        self._compute_rows(np.array([row]))
+        if not width:
+            return
+
+        # Insere o título novo nas listas dos vizinhos que ele supera
+        scores = self.vectors[:row] @ self.vectors[row]
+        enters = np.flatnonzero(scores > self.top_scores[:row, -1])
+        if not len(enters):
+            return
+        rows = np.hstack([self.top_rows[enters], np.full((len(enters), 1), row)])
+        candidates = np.hstack([self.top_scores[enters], scores[enters, None]])
+        order = np.argsort(-candidates, axis=1, kind='stable')[:, :width]
+        self.top_rows[enters] = np.take_along_axis(rows, order, axis=1)
+        self.top_scores[enters] = np.take_along_axis(candidates, order, axis=1)
+
+    def remove(self, movie_id):
+        """Retira um título, recalculando só as listas que o tinham como vizinho"""
+        row = self.rows.get(movie_id)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        affected = np.flatnonzero((self.top_rows == row).any(axis=1))
+
+        # A última linha ocupa o lugar da removida
+        if row != last:
+            moved_id = self.ids[last]
+            self.ids[row] = moved_id
+            self.rows[moved_id] = row
+            self.vectors[row] = self.vectors[last]
+            self.top_rows[row] = self.top_rows[last]
+            self.top_scores[row] = self.top_scores[last]
+            self.top_rows[self.top_rows == last] = row
+            affected = np.where(affected == last, row, affected)
+
+        self.ids.pop()
+        del self.rows[movie_id]
+        del self.movies[movie_id]
+        self.vectors = self.vectors[:last]
+        self.top_rows = self.top_rows[:last]
+        self.top_scores = self.top_scores[:last]
+        self._watch_next = None
+
+        width = min(self.k, max(last - 1, 0))
+        if width != self.width:
+            self._resize(width)
+            self._compute_rows(np.arange(len(self.ids)))
+            return
+        self._compute_rows(np.unique(affected))
+
+    def update(self, movie):
+        """Atualiza o vetor de um título e os vizinhos que dependem dele"""
+        row = self.rows.get(movie.get('id'))
+        if row is None:
+            return
+        self.movies[movie.get('id')] = movie
+        self.vectors[row] = self.encode(movie)
+        self._watch_next = None
+        if not self.width:
+            return
+
+        scores = self.vectors @ self.vectors[row]
+        scores[row] = -np.inf
+        # Linhas que tinham este título entre os vizinhos, ou que passam a ter
+        was_neighbour = (self.top_rows == row).any(axis=1)
+        enters = scores > self.top_scores[:, -1]
+        affected = np.flatnonzero(was_neighbour | enters)
+        self._compute_rows(np.union1d(affected, [row]))
+
+    def _resize(self, width):
+        self.width = width
+        self.top_rows = np.zeros((len(self.ids), width), dtype=np.int64)
+        self.top_scores = np.zeros((len(self.ids), width))
+
+    def _compute_rows(self, rows):
+        if not self.width:
+            return
+        for start in range(0, len(rows), BATCH_SIZE):
+            batch = rows[start:start + BATCH_SIZE]
+            scores = self.vectors[batch] @ self.vectors.T
+            scores[np.arange(len(batch)), batch] = -np.inf
+
+            top = np.argpartition(-scores, self.width - 1, axis=1)[:, :self.width]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            self.top_rows[batch] = np.take_along_axis(top, order, axis=1)
+            self.top_scores[batch] = np.take_along_axis(top_scores, order, axis=1)
+
+    def _compute_watch_next(self):
+        if not self.ids:
+            return []
+        statuses = np.array([self.movies[i].get('status') for i in self.ids])
+        ratings = np.array([self._rating(self.movies[i]) for i in self.ids], dtype=float)
+
+        seen = statuses != 'pending'
+        candidates = np.flatnonzero(~seen)
+        if not seen.any() or not len(candidates):
+            return []
+
+        # Perfil de gosto: média dos títulos vistos, pesada pela nota
+        weights = np.where(ratings[seen] > 0, ratings[seen], 2.5)
+        profile = weights @ self.vectors[seen]
+        norm = np.linalg.norm(profile)
+        if not norm:
+            return []
+        scores = self.vectors[candidates] @ (profile / norm)
+
+        order = np.argsort(-scores)
+        return [
+            (self.movies[self.ids[candidates[i]]], float(scores[i]))
+            for i in order
+        ]
+
+    @staticmethod
+    def _rating(movie):
+        try:
+            return int(movie.get('rating') or 0)
+        except (TypeError, ValueError):
+            return 0
@@ -0,0 +1,130 @@
+import threading
+from collections import OrderedDict
+
+# Quantas buscas recentes guardar por biblioteca
+MAX_CACHED_QUERIES = 32
+
+
+def matches(movie, query):
+    """Verifica se o filme corresponde à busca (título, gênero ou ano)"""
+    return (
+        query in movie.get('title', '').lower() or
+        query in movie.get('genre', '').lower() or
+        query in movie.get('year', '')
+    )
+
+
+class SingleFlight:
+    """
+    Junta chamadas simultâneas com a mesma chave: a primeira executa a
+    função e as demais esperam e recebem o mesmo resultado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Executa `fn` uma única vez por chave entre chamadas simultâneas"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+class SearchCache:
+    """
+    Resultados das buscas recentes de uma biblioteca.
+
+    Quem digita "inter" depois de "int" só precisa filtrar o resultado de
+    "int": todo texto que contém "inter" também contém "int". Os resultados
+    valem apenas para a versão da biblioteca em que foram calculados.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._results = OrderedDict()
+
+    def get(self, version, query):
+        """Retorna (resultado exato, candidatos) para a busca"""
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._results.clear()
+                return None, None
+
+            if query in self._results:
+                self._results.move_to_end(query)
+                return self._results[query], None
+
+            # Refina a busca anterior mais específica que ainda contém esta
+            prefix = max((q for q in self._results if q in query), key=len, default=None)
+            if prefix is None:
+                return None, None
+            self._results.move_to_end(prefix)
+            return None, self._results[prefix]
+
+    def nbytes(self):
+        """Estimativa da memória usada: uma referência por resultado guardado"""
+        with self._lock:
+            return sum(100 + len(q) + 8 * len(r) for q, r in self._results.items())
+
+    def put(self, version, query, results):
+        """Guarda o resultado de uma busca"""
+        with self._lock:
+            if version != self._version:
+                return
+            self._results[query] = results
+            self._results.move_to_end(query)
+            while len(self._results) > MAX_CACHED_QUERIES:
+                self._results.popitem(last=False)
+
+
+_flights = SingleFlight()
+
+
+def search_library(library, query):
+    """Busca filmes na biblioteca, reaproveitando buscas iguais ou anteriores"""
+    if not query:
+        return library.movies
+
+    version = library.version
+    return _flights.do(
+        (library.id, version, query),
+        lambda: _search(library, version, query)
+    )
+
+
+def _search(library, version, query):
+    if library.search_cache is None:
+        library.search_cache = SearchCache()
+
+    cached, candidates = library.search_cache.get(version, query)
+    if cached is not None:
+        return cached
+
+    if candidates is None:
+        candidates = library.movies
+    results = [m for m in candidates if matches(m, query)]
+    library.search_cache.put(version, query, results)
+    return results